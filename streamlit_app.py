@@ -1,37 +1,163 @@
 # Import necessary libraries
 import streamlit as st
 import pandas as pd
+import numpy as np
 import re
 import logging
+import hashlib
+import io
+import json
+import os
+import string
+import requests
 
 # Configure logging to capture errors
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
+# Compile regex patterns once at import time instead of on every call.
+# _LINE_RE classifies a whole input buffer in one multi-line scan:
+# group 1 = bare username, group 2 = username from a TikTok URL,
+# group 3 = anything else (invalid line). The cheap character-class
+# alternative comes first since bare usernames are the common input
+_LINE_RE = re.compile(
+    r"^([A-Za-z0-9_.]+)$"
+    r"|^(?:https?://)?(?:www\.)?tiktok\.com/@([A-Za-z0-9_.]+).*$"
+    r"|^(.+)$",
+    re.M | re.ASCII,
+)
+_NONDIGIT_RE = re.compile(r"\D", re.ASCII)
+
+# Characters allowed in a bare username, plus the line separator; used
+# to detect all-username buffers with one set difference
+_USERNAME_CHARS = frozenset(string.ascii_letters + string.digits + '_.\n')
+
+# Directory for the on-disk DataFrame cache that survives server restarts
+_CACHE_DIR = ".cache"
+
+# Shared HTTP session so repeated sheet fetches reuse the TCP/TLS
+# connection and negotiate gzip on the wire
+_HTTP_SESSION = requests.Session()
+_HTTP_SESSION.headers['Accept-Encoding'] = 'gzip'
+
+# Columns the app actually uses; anything else is dropped inside the
+# CSV parser rather than materialized
+_REQUIRED_COLUMNS = [
+    'username', 'unit_sold_last_30_days', '% category', 'brand', 'phone', 'email'
+]
+_CSV_DTYPES = {
+    'phone': 'string[pyarrow]',
+    'username': 'string[pyarrow]',
+    'brand': 'string[pyarrow]',
+    'email': 'string[pyarrow]',
+}
+
 # Function to extract TikTok usernames from a list of inputs
 def extract_tiktok_usernames(inputs):
     """
     Extracts TikTok usernames from URLs or accepts them directly.
     """
-    pattern = re.compile(r"(?:https?://)?(?:www\.)?tiktok\.com/@([A-Za-z0-9_.]+)")
-    valid_usernames = []
-    invalid_inputs = []
-
-    for line in inputs:
-        line = line.strip()
-        if not line:
-            continue  # Skip empty lines
-        match = pattern.match(line)
-        if match:
-            valid_usernames.append(match.group(1))
-        elif re.match(r"^[A-Za-z0-9_.]+$", line):
-            # Line is a valid username
-            valid_usernames.append(line)
-        else:
-            invalid_inputs.append(line)
+    if not inputs:
+        return [], []
+
+    # Join the lines and let one multi-line scan classify them all,
+    # instead of dispatching a match call per line; empty lines simply
+    # never match
+    text = "\n".join(line.strip() for line in inputs)
+
+    # Common case: every line is already a bare username, decided by a
+    # single set-membership pass with no regex work at all
+    if not (set(text) - _USERNAME_CHARS):
+        return [line for line in text.split('\n') if line], []
+
+    # Partition the tagged lines with comprehensions instead of
+    # append-in-loop dispatches; unmatched groups come back as ''
+    tagged = _LINE_RE.findall(text)
+    valid_usernames = [bare or url for bare, url, invalid in tagged if not invalid]
+    invalid_inputs = [invalid for _, _, invalid in tagged if invalid]
 
     return valid_usernames, invalid_inputs
 
+# Helper to fetch the sheet's ETag (or Last-Modified) for cache validation
+def _sheet_etag(csv_url):
+    """
+    Returns the ETag or Last-Modified header of a remote CSV, or None.
+    """
+    if not csv_url.startswith(('http://', 'https://')):
+        return None
+    try:
+        response = _HTTP_SESSION.head(csv_url, timeout=10, allow_redirects=True)
+        return response.headers.get('ETag') or response.headers.get('Last-Modified')
+    except Exception as e:
+        logger.warning(f"Could not fetch ETag for cache validation: {e}")
+        return None
+
+# Helper to download a remote CSV into memory through the shared session
+def _fetch_csv_source(csv_url):
+    """
+    Returns a source pandas can parse: an in-memory buffer for remote
+    URLs, or the path itself for local files.
+    """
+    if not csv_url.startswith(('http://', 'https://')):
+        return csv_url
+    response = _HTTP_SESSION.get(csv_url, timeout=30)
+    response.raise_for_status()
+    return io.BytesIO(response.content)
+
+# Helper to parse the CSV, reusing an on-disk feather copy when unchanged
+def _read_csv_with_disk_cache(csv_url):
+    """
+    Reads the CSV, skipping pandas CSV parsing when an on-disk feather
+    copy matches the sheet's current ETag.
+    """
+    cache_key = hashlib.sha1(csv_url.encode()).hexdigest()
+    cache_path = os.path.join(_CACHE_DIR, f"{cache_key}.feather")
+    meta_path = os.path.join(_CACHE_DIR, f"{cache_key}.json")
+
+    etag = _sheet_etag(csv_url)
+    if etag and os.path.exists(cache_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path) as f:
+                if json.load(f).get('etag') == etag:
+                    return pd.read_feather(cache_path, dtype_backend='pyarrow')
+        except Exception as e:
+            logger.warning(f"Could not read disk cache, re-parsing CSV: {e}")
+
+    # Download once through the shared session, then parse in bounded
+    # chunks so large sheets never sit in memory twice, projecting down
+    # to the required columns inside the C parser
+    source = _fetch_csv_source(csv_url)
+    with pd.read_csv(
+        source,
+        usecols=lambda col: col in _REQUIRED_COLUMNS,
+        dtype=_CSV_DTYPES,
+        dtype_backend='pyarrow',
+        chunksize=200_000,
+        on_bad_lines='skip',
+    ) as reader:
+        chunks = list(reader)
+    if chunks:
+        df = pd.concat(chunks)
+    else:
+        # Header-only sheet: a plain read still yields the column layout
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        df = pd.read_csv(
+            source,
+            usecols=lambda col: col in _REQUIRED_COLUMNS,
+            dtype=_CSV_DTYPES,
+            dtype_backend='pyarrow',
+        )
+    if etag:
+        try:
+            os.makedirs(_CACHE_DIR, exist_ok=True)
+            df.to_feather(cache_path)
+            with open(meta_path, 'w') as f:
+                json.dump({'etag': etag, 'url': csv_url}, f)
+        except Exception as e:
+            logger.warning(f"Could not write disk cache: {e}")
+    return df
+
 # Function to load data from a CSV URL
 @st.cache_data(show_spinner=False)
 def load_csv_data(csv_url):
@@ -39,77 +165,113 @@ def load_csv_data(csv_url):
     Loads data from a CSV export link from Google Sheets.
     """
     try:
-        df = pd.read_csv(csv_url, dtype={'phone': str})
+        df = _read_csv_with_disk_cache(csv_url)
+        if 'username' in df.columns:
+            # Dictionary-encode usernames so index lookups compare int32
+            # codes instead of Python strings, then index by username so
+            # queries hash into the index instead of scanning the column
+            # row by row; keep the first row per username so the index
+            # works like a dict with O(1) lookups
+            df['username'] = df['username'].astype('category')
+            df = df.set_index('username', drop=False)
+            if not df.index.is_unique:
+                df = df[~df.index.duplicated(keep='first')]
+        # Validate the schema once per cached load instead of per query
+        df.attrs['missing_columns'] = [
+            col for col in _REQUIRED_COLUMNS if col not in df.columns
+        ]
         return df
     except Exception as e:
         logger.error(f"Error loading CSV: {e}")
         st.error(f"Error loading CSV: {e}")
         return pd.DataFrame()
 
+# Helper to serialize a DataFrame for download, cached on frame contents
+@st.cache_data(show_spinner=False)
+def _df_to_csv_bytes(df):
+    """
+    Serializes a DataFrame to CSV bytes, cached so Streamlit reruns
+    reuse the encoded payload when the data is unchanged.
+    """
+    return df.to_csv(index=False).encode('utf-8')
+
+# Helper to build one output column from found values plus the sentinel
+def _masked_column(values, found_mask):
+    """
+    Builds an object column taking found values where the mask holds
+    and "Not found" elsewhere.
+    """
+    return np.where(found_mask, np.asarray(values, dtype=object), "Not found")
+
 # Function to query the CSV data with usernames
 def query_database(usernames, df):
     """
     Queries the DataFrame for the given usernames.
     """
-    results = []
-    not_found_count = 0
-    usernames_not_found = []
-    required_columns = [
-        'username', 'unit_sold_last_30_days', '% category', 'brand', 'phone', 'email'
-    ]
-
-    # Check for required columns
-    missing_columns = [col for col in required_columns if col not in df.columns]
+    # Check for required columns, reusing the validation done at load
+    # time when the frame came through load_csv_data
+    missing_columns = df.attrs.get('missing_columns')
+    if missing_columns is None:
+        missing_columns = [col for col in _REQUIRED_COLUMNS if col not in df.columns]
     if missing_columns:
         st.error(f"Missing columns in CSV: {', '.join(missing_columns)}")
         logger.error(f"Missing columns in CSV: {missing_columns}")
-        return results, len(usernames), []
-
-    # Use pandas merge for efficient querying
-    usernames_df = pd.DataFrame({'username': usernames})
-    merged_df = usernames_df.merge(df, on='username', how='left', indicator=True)
-
-    for i, row in merged_df.iterrows():
-        if row['_merge'] == 'both':
-            # Process phone number
-            phone_number = str(row["phone"])
-            # Remove any non-digit characters
-            phone_number = re.sub(r'\D', '', phone_number)
-            # Ensure phone number is 10 characters long and starts with '0'
-            if not phone_number.startswith('0'):
-                phone_number = '0' + phone_number
-            phone_number = phone_number[-10:].zfill(10)
-
-            # Process unit_sold_last_30_days
-            unit_sold = row["unit_sold_last_30_days"]
-            if pd.notnull(unit_sold) and isinstance(unit_sold, (int, float)):
-                unit_sold = int(unit_sold)
-            else:
-                unit_sold = "Not found"
-
-            results.append({
-                "Record #": i + 1,
-                "username": row['username'],
-                "unit_sold_last_30_days": unit_sold,
-                "% category": row["% category"],
-                "brand": row["brand"],
-                "phone": phone_number,
-                "email": row["email"]
-            })
-        else:
-            not_found_count += 1
-            usernames_not_found.append(row['username'])
-            results.append({
-                "Record #": i + 1,
-                "username": row['username'],
-                "unit_sold_last_30_days": "Not found",
-                "% category": "Not found",
-                "brand": "Not found",
-                "phone": "Not found",
-                "email": "Not found"
-            })
-
-    return results, not_found_count, usernames_not_found
+        return pd.DataFrame(), len(usernames), []
+
+    # Deduplicate the queried usernames so pasted duplicates are looked
+    # up once; inverse maps results back to the original order
+    names = np.asarray(usernames, dtype=object)
+    unique_names, inverse = np.unique(names, return_inverse=True)
+
+    # Hash the unique usernames through the index in one call; -1 marks
+    # usernames with no matching row
+    hit = df.index.get_indexer(unique_names)
+    found_unique = hit >= 0
+    if len(df):
+        # Misses borrow the first row as a placeholder; every output
+        # column masks them to "Not found" below
+        sub = df.take(np.where(found_unique, hit, 0))
+    else:
+        sub = df.reindex(unique_names)
+    found_mask = found_unique[inverse]
+
+    # Process phone numbers as whole-Series string kernels:
+    # strip non-digits, ensure a leading '0', pad to 10 characters
+    phones = sub['phone'].fillna('').astype('string').str.replace(_NONDIGIT_RE, '', regex=True)
+    phones = phones.where(phones.str.startswith('0'), '0' + phones)
+    phones = phones.str.slice(-10).str.zfill(10)
+
+    # Process unit_sold_last_30_days: coerce to nullable integers
+    unit_sold = pd.to_numeric(sub['unit_sold_last_30_days'], errors='coerce').astype('Int64')
+
+    # Assemble the result column by column from flat arrays, so no
+    # per-row dicts are allocated and dtypes stay predictable
+    results_df = pd.DataFrame({
+        "Record #": np.arange(1, len(names) + 1, dtype=np.int32),
+        "username": names,
+        "unit_sold_last_30_days": _masked_column(
+            unit_sold, found_unique & unit_sold.notna().to_numpy()
+        )[inverse],
+        "% category": _masked_column(sub['% category'], found_unique)[inverse],
+        "brand": _masked_column(sub['brand'], found_unique)[inverse],
+        "phone": _masked_column(phones, found_unique)[inverse],
+        "email": _masked_column(sub['email'], found_unique)[inverse],
+    })
+
+    not_found_count = int((~found_mask).sum())
+    usernames_not_found = names[~found_mask].tolist()
+
+    return results_df, not_found_count, usernames_not_found
+
+# Helper to run a query once per (CSV URL, username tuple) combination
+@st.cache_data(show_spinner=False)
+def _cached_query(csv_url, usernames_tuple):
+    """
+    Runs query_database for a tuple of usernames, cached so re-clicks
+    with the same inputs reuse the previous result.
+    """
+    df = load_csv_data(csv_url)
+    return query_database(list(usernames_tuple), df)
 
 # Main function to run the Streamlit app
 def main():
@@ -162,15 +324,16 @@ def main():
                 if valid_usernames:
                     st.success(f"Extracted {len(valid_usernames)} valid username(s).")
                     # Query the CSV for matching usernames
-                    results, not_found_count, usernames_not_found = query_database(valid_usernames, df)
-                    results_df = pd.DataFrame(results)
+                    results_df, not_found_count, usernames_not_found = _cached_query(
+                        csv_url, tuple(valid_usernames)
+                    )
 
                     # Display results
                     st.header("Query Results")
                     st.dataframe(results_df)
 
                     # Downloadable CSV of results
-                    csv_data = results_df.to_csv(index=False).encode('utf-8')
+                    csv_data = _df_to_csv_bytes(results_df)
                     st.download_button(
                         label="⬇️ Download Results as CSV",
                         data=csv_data,
@@ -184,7 +347,7 @@ def main():
                         st.code('\n'.join(usernames_not_found))
                         # Downloadable CSV of usernames not found
                         not_found_df = pd.DataFrame({'username': usernames_not_found})
-                        not_found_csv = not_found_df.to_csv(index=False).encode('utf-8')
+                        not_found_csv = _df_to_csv_bytes(not_found_df)
                         st.download_button(
                             label="⬇️ Download Usernames Not Found as CSV",
                             data=not_found_csv,